@@ -2,92 +2,278 @@
 API-based URL-to-Markdown conversion (CPU only).
 
 Fetches HTML via curl_cffi (browser TLS impersonation) and converts to
-markdown using readability + markdownify.
+markdown using readability + markdownify (html-to-markdown, in Rust, opt-in).
 """
 
+import asyncio
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
 import modal
 
 app = modal.App("shelf-api")
 
+# Inputs served at once per container.  URL conversions are capped at the
+# same number across inputs, each URL of a `convert_many` call counting once.
+MAX_CONCURRENT = 16
+
+# CPU cores reserved per container, and so the number of extraction workers.
+# (os.cpu_count() reports the host's cores, not the reservation.)
+CPU = 2
+
+# Converted pages kept per container, keyed by URL (revalidated with
+# ETag / Last-Modified) or by a digest of the HTML posted to `process`.
+# Only title, author and markdown are kept; images are downloaded again on
+# each hit so entries stay small.
+CACHE_SIZE = 256
+
 image = (
     modal.Image.debian_slim(python_version="3.12")
     .pip_install(
         "readability-lxml", "lxml[html_clean]", "markdownify",
-        "curl_cffi",
+        "html-to-markdown>=3", "curl_cffi", "orjson",
     )
     .add_local_file("lib.py", "/root/lib.py")
 )
 
+# Resolved once at container start rather than on every call; the block
+# tolerates these packages being absent locally at deploy time.
+with image.imports():
+    import orjson
+    from fastapi.responses import Response
+
+    from lib import (
+        LRUCache,
+        article_fallback_html,
+        build_result,
+        extract_article_html,
+        extract_metadata,
+        fetch_page_async,
+        format_result,
+        is_archive_snapshot,
+        localize_images,
+        new_async_session,
+        parse_archive_html,
+        parse_html,
+        postprocess,
+        readability_summary,
+        to_markdown,
+        visible_text_len,
+    )
+
+
+def _json(payload, status_code=200):
+    """Serialize *payload* with orjson into a JSON response."""
+    return Response(
+        orjson.dumps(payload), status_code=status_code, media_type="application/json",
+    )
+
 
 @app.cls(
     image=image,
     scaledown_window=5 * 60,
     timeout=60,
     max_containers=10,
-    max_inputs=1,
+    cpu=CPU,
 )
+@modal.concurrent(max_inputs=MAX_CONCURRENT)
 class Converter:
-    def _extract(self, raw_html: str):
-        """Run readability + markdownify on raw HTML."""
-        import re
+    @modal.enter()
+    async def _start(self):
+        """Create the extract pool, HTTP session, cache and concurrency limit."""
+        # CPU-bound extraction runs here, one worker per reserved core;
+        # image downloads (I/O) stay on the default executor.
+        self.pool = ThreadPoolExecutor(max_workers=CPU, thread_name_prefix="extract")
+        self.session = new_async_session()
+        self.cache = LRUCache(CACHE_SIZE)
+        self.limit = asyncio.Semaphore(MAX_CONCURRENT)
 
-        from markdownify import markdownify
-        from readability import Document
+    @modal.exit()
+    async def _stop(self):
+        await self.session.close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
 
-        from lib import article_fallback_html, extract_article_html, extract_metadata
+    def _extract(self, raw_html: str, tree=None):
+        """Run readability + markdown conversion on raw HTML.
 
-        title, author = extract_metadata(raw_html)
+        *raw_html* is parsed once and the tree shared by every helper and
+        readability; pass *tree* if it's already parsed (e.g. streamed).
+        """
+        if tree is None:
+            if is_archive_snapshot(raw_html):
+                tree = parse_archive_html(raw_html)
+            else:
+                tree = parse_html(raw_html)
+        title, author = extract_metadata(raw_html, tree)
 
         # Prefer semantic <article> element for archive.is (avoids
         # readability mis-scoring on deeply-nested CSS grid pages).
-        article_html = extract_article_html(raw_html)
+        article_html = extract_article_html(raw_html, tree)
         if article_html is not None:
-            markdown = markdownify(article_html, heading_style="ATX")
+            markdown = to_markdown(article_html)
             return title, author, markdown
 
-        doc = Document(raw_html)
-        article_html = doc.summary()
-        markdown = markdownify(article_html, heading_style="ATX")
-        heading = title or doc.short_title()
-        if heading:
-            markdown = f"# {heading}\n\n{markdown}"
+        # Readability deep-copies the tree before cleaning it, so handing it
+        # our tree only drops hidden elements from it in place.
+        doc, article_html, article_tree = readability_summary(tree)
 
         # If the page has a semantic <article> element with significantly
         # more text than readability extracted, readability likely
         # mis-scored and picked only a subsection.  Fall back to the
-        # full <article> element.
-        fallback_html, fallback_text_len = article_fallback_html(raw_html)
-        if fallback_html is not None:
-            plain = re.sub(r'[#*\[\]()>|_~`\-]', '', markdown)
-            readability_text_len = len(re.sub(r'\s+', ' ', plain).strip())
-            if readability_text_len < fallback_text_len * 0.5:
-                markdown = markdownify(fallback_html, heading_style="ATX")
+        # full <article> element.  Lengths are compared on the lxml trees
+        # so conversion only runs on the winner.
+        fallback_html, fallback_text_len = article_fallback_html(raw_html, tree)
+        if fallback_html is not None and visible_text_len(article_tree) < fallback_text_len * 0.5:
+            markdown = to_markdown(fallback_html)
+            return title, author, markdown
 
+        markdown = to_markdown(article_html)
+        heading = title or doc.short_title()
+        if heading:
+            markdown = f"# {heading}\n\n{markdown}"
         return title, author, markdown
 
-    def _convert(self, url: str) -> dict:
-        from lib import fetch_html, postprocess
-
-        raw_html = fetch_html(url)
-        title, author, markdown = self._extract(raw_html)
+    def _convert_html(self, raw_html: str, tree=None) -> dict:
+        """Extract and postprocess: the CPU-bound part of a conversion."""
+        title, author, markdown = self._extract(raw_html, tree)
         result = postprocess(markdown)
         return {"title": title, "author": author, "markdown": result}
 
-    @modal.fastapi_endpoint(method="POST")
-    def convert(self, data: dict):
-        from lib import build_result
+    def _process_html(self, raw_html: str) -> dict:
+        """Convert posted HTML, reusing the conversion of identical HTML."""
+        key = ("html", hashlib.blake2b(raw_html.encode("utf-8")).digest())
+        result = self.cache.get(key)
+        if result is None:
+            result = self._convert_html(raw_html)
+            self.cache.put(key, result)
+        return result
 
-        url = data["url"]
-        result = self._convert(url)
-        return build_result(result, url)
+    def _process_article(self, data: dict) -> dict:
+        """Convert an already-isolated ``article_html`` without readability."""
+        return {
+            "title": data.get("title", ""),
+            "author": data.get("author", ""),
+            "markdown": postprocess(to_markdown(data["article_html"])),
+        }
+
+    async def _convert_url(self, url: str) -> dict:
+        """Fetch and convert *url*, reusing its cached conversion if still valid.
+
+        Callers hold `self.limit`.
+        """
+        key = ("url", url)
+        cached = self.cache.get(key)
+        raw_html, tree, validators = await fetch_page_async(
+            self.session, url, validators=cached[0] if cached else None,
+        )
+        if raw_html is None:
+            return cached[1]
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.pool, self._convert_html, raw_html, tree,
+        )
+        if validators:
+            self.cache.put(key, (validators, result))
+        return result
+
+    async def _run(self, url: str) -> dict:
+        """Fetch and convert *url*, at most MAX_CONCURRENT at a time."""
+        async with self.limit:
+            result = await self._convert_url(url)
+            result = await asyncio.to_thread(localize_images, result)
+        return format_result(result, url)
 
     @modal.fastapi_endpoint(method="POST")
-    def process(self, data: dict):
-        """Process pre-fetched HTML (skip HTTP fetch)."""
-        from lib import build_result, postprocess
+    async def convert(self, data: dict):
+        return _json(await self._run(data["url"]))
 
-        url = data["url"]
-        html = data["html"]
-        title, author, markdown = self._extract(html)
+    @modal.fastapi_endpoint(method="POST")
+    async def convert_md(self, data: dict):
+        """Convert a URL and return the markdown itself as the body.
+
+        The UTF-8 body skips JSON string escaping; title and author travel
+        base64-encoded in ``X-Title`` / ``X-Author`` headers.  Images are
+        not downloaded, so they keep their remote URLs.
+        """
+        async with self.limit:
+            result = await self._convert_url(data["url"])
+        return Response(
+            content=result["markdown"].encode("utf-8"),
+            media_type="text/markdown; charset=utf-8",
+            headers={
+                "X-Title": base64.b64encode(result["title"].encode("utf-8")).decode("ascii"),
+                "X-Author": base64.b64encode(result["author"].encode("utf-8")).decode("ascii"),
+            },
+        )
+
+    @modal.method()
+    def finish(self, url: str, title: str, author: str, markdown: str) -> dict:
+        """Postprocess markdown and download images (background half of convert_fast)."""
         result = postprocess(markdown)
         return build_result({"title": title, "author": author, "markdown": result}, url)
+
+    @modal.fastapi_endpoint(method="POST")
+    async def convert_fast(self, data: dict):
+        """Return raw extracted markdown now; finish the rest in the background.
+
+        The response carries a ``token`` that can be polled via `finalize`
+        for the same payload `convert` returns.  The URL cache holds only
+        postprocessed conversions, so it is not consulted here.
+        """
+        url = data["url"]
+        async with self.limit:
+            raw_html, tree, _ = await fetch_page_async(self.session, url)
+            title, author, markdown = await asyncio.get_running_loop().run_in_executor(
+                self.pool, self._extract, raw_html, tree,
+            )
+        call = await Converter().finish.spawn.aio(url, title, author, markdown)
+        return _json({
+            "title": title,
+            "author": author,
+            "markdown": markdown,
+            "token": call.object_id,
+        })
+
+    @modal.fastapi_endpoint(method="GET")
+    async def finalize(self, token: str):
+        """Poll for a convert_fast result; 202 until it is ready."""
+        call = modal.FunctionCall.from_id(token)
+        try:
+            result = await call.get.aio(timeout=0)
+        except TimeoutError:
+            return _json({"status": "pending"}, status_code=202)
+        return _json(result)
+
+    @modal.fastapi_endpoint(method="POST")
+    async def process(self, data: dict):
+        """Process pre-fetched HTML (skip HTTP fetch).
+
+        Callers that have already isolated the article can send it as
+        ``article_html`` (with optional ``title`` and ``author``) instead
+        of ``html``; it is converted directly, skipping readability.
+        """
+        loop = asyncio.get_running_loop()
+        if "article_html" in data:
+            result = await loop.run_in_executor(self.pool, self._process_article, data)
+        else:
+            result = await loop.run_in_executor(self.pool, self._process_html, data["html"])
+        result = await asyncio.to_thread(localize_images, result)
+        return _json(format_result(result, data["url"]))
+
+    @modal.fastapi_endpoint(method="POST")
+    async def convert_many(self, data: dict):
+        """Convert several URLs concurrently.
+
+        Returns one result per URL, in order; failures carry an ``error``
+        field instead of content.
+        """
+        urls = data["urls"]
+        results = await asyncio.gather(
+            *(self._run(url) for url in urls),
+            return_exceptions=True,
+        )
+        return _json([
+            {"url": url, "error": str(r), "type": type(r).__name__}
+            if isinstance(r, BaseException) else r
+            for url, r in zip(urls, results)
+        ])
@@ -1,17 +1,26 @@
 """Shared utilities for HTML-to-Markdown post-processing."""
 
+import asyncio
 import base64
+import functools
 import os.path
 import re
 import textwrap
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
-from html import unescape
 from urllib.parse import urlparse
 
 # ---------------------------------------------------------------------------
 # HTML fetching and metadata extraction
 # ---------------------------------------------------------------------------
 
+BROWSER_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
 def fetch_html(url, timeout=30):
     """Fetch HTML using curl_cffi with browser TLS impersonation."""
     from curl_cffi import requests as curl_requests
@@ -20,44 +29,225 @@ def fetch_html(url, timeout=30):
         url,
         impersonate="chrome",
         timeout=timeout,
-        headers={
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "en-US,en;q=0.9",
-        },
+        headers=BROWSER_HEADERS,
         allow_redirects=True,
     )
     resp.raise_for_status()
     return resp.text
 
 
-def extract_article_html(raw_html):
+def new_async_session():
+    """Create a curl_cffi AsyncSession for concurrent fetches."""
+    from curl_cffi.requests import AsyncSession
+
+    return AsyncSession(impersonate="chrome", headers=BROWSER_HEADERS)
+
+
+async def fetch_page_async(session, url, timeout=30, validators=None):
+    """Stream a page through lxml as it downloads.
+
+    Chunks are fed to an incremental HTML parser while the body is still
+    arriving, so parsing overlaps the network.  Returns ``(raw_html, tree,
+    validators)`` where *tree* is the parsed root element (``None`` for an
+    empty body) and *validators* holds the conditional-request headers
+    (``If-None-Match`` / ``If-Modified-Since``) for refetching this page.
+
+    Passing *validators* from an earlier fetch makes the request
+    conditional; if the server answers 304, *raw_html* and *tree* are
+    ``None`` and the cached copy is still current.
+    """
+    import codecs
+
+    import lxml.etree
+    import lxml.html
+
+    resp = await session.get(
+        url, timeout=timeout, allow_redirects=True, stream=True, headers=validators,
+    )
+    try:
+        resp.raise_for_status()
+        new_validators = {}
+        if resp.headers.get("ETag"):
+            new_validators["If-None-Match"] = resp.headers["ETag"]
+        if resp.headers.get("Last-Modified"):
+            new_validators["If-Modified-Since"] = resp.headers["Last-Modified"]
+        if resp.status_code == 304:
+            return None, None, validators
+        encoding = resp.encoding
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = "utf-8"
+        parser = lxml.html.HTMLParser(encoding=encoding, collect_ids=False)
+        chunks = []
+        async for chunk in resp.aiter_content():
+            chunks.append(chunk)
+            parser.feed(chunk)
+    finally:
+        await resp.aclose()
+    raw_html = b"".join(chunks).decode(encoding, errors="replace")
+    try:
+        tree = parser.close()
+    except lxml.etree.XMLSyntaxError:
+        # Nothing was fed: lxml reports an empty body as a syntax error.
+        tree = None
+    return raw_html, tree, new_validators
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+
+def parse_html(raw_html):
+    """Parse an HTML document into an lxml tree.
+
+    Goes through UTF-8 bytes (as readability does internally) because
+    lxml rejects str input that carries an XML encoding declaration.
+    Nothing looks elements up by ID, so the parser skips building that
+    index.
+    """
+    import lxml.html
+
+    return lxml.html.document_fromstring(
+        raw_html.encode("utf-8", "replace"),
+        parser=lxml.html.HTMLParser(encoding="utf-8", collect_ids=False),
+    )
+
+
+_ARTICLE_START_RE = re.compile(r"(?i)<article[\s>]")
+# A tag's attributes, with quoted values kept whole so a ">" or "<" inside
+# one doesn't end the tag or start another.
+_TAG_ATTRS = r"""(?:[^>"'=]++|=\s*+"[^"]*+"|=\s*+'[^']*+'|=)*+"""
+# From a position, skips text, comments, scripts and styles (whole) and
+# every other tag, then matches the next real <article> or </article> tag.
+# The skip is possessive, so it is never re-tried from inside a comment
+# or an attribute value.
+_NEXT_ARTICLE_TAG_RE = re.compile(
+    r"(?is)(?:[^<]++"
+    r"|<!--(?:[^-]++|-(?!->))*+(?:-->)?"
+    r"|<script(?=[\s/>])" + _TAG_ATTRS + r">(?:[^<]++|<(?!/script[\s>]))*+"
+    r"|<style(?=[\s/>])" + _TAG_ATTRS + r">(?:[^<]++|<(?!/style[\s>]))*+"
+    r"|<(?!/?article[\s/>])(?:/?[a-z]" + _TAG_ATTRS + r">)?"
+    r")*+"
+    r"<(/?)article(?=[\s/>])" + _TAG_ATTRS + r">"
+)
+
+
+def is_archive_snapshot(raw_html):
+    """Report whether *raw_html* is an archive.is snapshot.
+
+    Snapshots are identified by their characteristic wrapper div IDs.
+    """
+    return 'id="SOLID"' in raw_html and 'id="CONTENT"' in raw_html
+
+
+def _first_article_end(raw_html):
+    """Return the offset just past the tag closing the first <article>.
+
+    Nested <article> elements are counted, and anything inside comments,
+    scripts, styles or quoted attribute values is ignored.  Returns None
+    if the first <article> is never closed (or there is none).
+    """
+    depth = pos = 0
+    while True:
+        m = _NEXT_ARTICLE_TAG_RE.match(raw_html, pos)
+        if m is None:
+            return None
+        pos = m.end()
+        if not m.group(1):
+            depth += 1
+        elif depth:
+            depth -= 1
+            if not depth:
+                return pos
+
+
+def parse_archive_html(raw_html):
+    """Parse an archive.is snapshot only as far as its first </article>.
+
+    Everything the archive.is path reads (head metadata and the article
+    itself) comes before the tag closing the first <article>, so the rest
+    of the snapshot, often several hundred KB of inlined layout, is never
+    parsed.  lxml closes the elements left open by the cut.  Falls back
+    to a full parse if the first <article> can't be located or the cut
+    tree lost it.
+    """
+    end = _first_article_end(raw_html)
+    if end is None:
+        return parse_html(raw_html)
+    # Keep the text right after the article too: it is the element's
+    # tail, which serializing the article includes.
+    tail_end = raw_html.find("<", end)
+    tree = parse_html(raw_html if tail_end < 0 else raw_html[:tail_end])
+    if tree.find(".//article") is None:
+        return parse_html(raw_html)
+    return tree
+
+
+# Page chrome dropped from <article> elements before conversion.
+_NON_CONTENT_TAGS = frozenset({"button", "svg", "aside", "nav", "footer", "header"})
+
+
+def extract_article_html(raw_html, tree=None):
     """Extract article HTML from archive.is snapshots.
 
     Archive.is renders pages into deeply nested divs with inline CSS
     grid layout that fragments content across sibling containers.
     Readability's scoring cannot reassemble these fragments, so we
     bypass it entirely: find the <article> element, clean it, and
-    return its HTML for direct markdownify conversion.
+    return its HTML for direct conversion with `to_markdown`.
 
     Returns the cleaned HTML string, or None if this isn't an
-    archive.is page (caller falls back to readability).
+    archive.is page (caller falls back to readability).  Pass *tree* to
+    reuse an already-parsed tree (it is modified in place).
     """
+    import lxml.etree
     import lxml.html
 
-    # Only activate for archive.is snapshots (identified by their
-    # characteristic wrapper div IDs).
-    if 'id="SOLID"' not in raw_html or 'id="CONTENT"' not in raw_html:
+    # Only activate for archive.is snapshots.
+    if not is_archive_snapshot(raw_html):
         return None
 
-    tree = lxml.html.fromstring(raw_html)
+    if tree is None:
+        # Without an <article> there is nothing to extract; don't parse.
+        if not _ARTICLE_START_RE.search(raw_html):
+            return None
+        tree = parse_archive_html(raw_html)
     article = tree.find('.//article')
     if article is None:
         return None
 
+    # One walk collects both hidden and non-content elements.
+    hidden, strip = [], []
+    for el in article.iterdescendants(lxml.etree.Element):
+        if "display:none" in (el.get("style") or ""):
+            hidden.append(el)
+        if el.tag in _NON_CONTENT_TAGS:
+            strip.append(el)
+
     # Remove display:none elements *safely*: preserve .tail text.
     # Archive.is uses display:none spans for drop-caps whose .tail
     # holds the actual paragraph text.
-    for el in article.xpath('.//*[contains(@style, "display:none")]'):
+    for el in hidden:
         parent = el.getparent()
         if parent is None:
             continue
@@ -70,82 +260,179 @@ def extract_article_html(raw_html):
         parent.remove(el)
 
     # Strip non-content elements.
-    for tag in ("button", "svg", "aside", "nav", "footer", "header"):
-        for el in article.findall(f".//{tag}"):
-            parent = el.getparent()
-            if parent is not None:
-                parent.remove(el)
+    for el in strip:
+        parent = el.getparent()
+        if parent is not None:
+            parent.remove(el)
 
     return lxml.html.tostring(article, encoding="unicode")
 
 
-def article_fallback_html(raw_html):
+def article_fallback_html(raw_html, tree=None):
     """Extract the largest <article> element as a fallback.
 
     Used when readability mis-scores a page and captures only a fraction
     of the content (e.g. Chatham House splits article body across sibling
     divs).  Returns ``(html_str, text_length)`` or ``(None, 0)`` if no
-    suitable element is found.
+    suitable element is found.  Pass *tree* to reuse an already-parsed
+    tree (it is modified in place).
     """
+    import lxml.etree
     import lxml.html
 
-    tree = lxml.html.fromstring(raw_html)
+    if tree is None:
+        tree = parse_html(raw_html)
     articles = tree.findall('.//article')
     if not articles:
         return None, 0
 
-    article = max(articles, key=lambda el: len(el.text_content()))
+    # Score candidates by text length without building each text string;
+    # most pages have a single <article> and need no scoring at all.
+    if len(articles) == 1:
+        article = articles[0]
+    else:
+        article = max(articles, key=lambda el: sum(map(len, el.itertext())))
+    _text_cleaner()(article)
     text_len = len(article.text_content().strip())
     if text_len < 200:
         return None, 0
 
-    for tag in ("button", "svg", "aside", "nav", "footer", "header"):
-        for el in article.findall(f".//{tag}"):
-            parent = el.getparent()
-            if parent is not None:
-                parent.remove(el)
+    strip = [
+        el for el in article.iterdescendants(lxml.etree.Element)
+        if el.tag in _NON_CONTENT_TAGS
+    ]
+    for el in strip:
+        parent = el.getparent()
+        if parent is not None:
+            parent.remove(el)
 
     return lxml.html.tostring(article, encoding="unicode"), text_len
 
 
-def extract_metadata(raw_html):
-    """Extract title and author from HTML meta tags and headings.
+# Set SHELF_HTML_TO_MARKDOWN=1 to convert with the Rust html-to-markdown
+# library instead of markdownify.  It is faster but its output differs: it
+# drops the space after an image (or linked image) that starts a paragraph,
+# makes a header-less table's first row the header, flattens <dl> lists
+# and drops the blank line before a blockquote.
+USE_HTML_TO_MARKDOWN = os.environ.get("SHELF_HTML_TO_MARKDOWN") == "1"
+
+
+@functools.cache
+def _markdown_options():
+    from html_to_markdown import ConversionOptions
+
+    # Match markdownify's heading, bullet and escaping defaults.
+    return ConversionOptions(
+        heading_style="atx", bullets="*+-",
+        escape_asterisks=True, escape_underscores=True,
+        extract_metadata=False, exclude_selectors=["svg"],
+    )
+
+
+def to_markdown(html):
+    """Convert an HTML fragment to ATX-heading markdown."""
+    if USE_HTML_TO_MARKDOWN:
+        from html_to_markdown import convert
+
+        return convert(html, _markdown_options()).content
+
+    from markdownify import markdownify
+
+    return markdownify(html, heading_style="ATX")
+
+
+_GARBAGE_TITLES = {"javascript is not available", "just a moment", "attention required"}
 
-    Title priority: <h1> > og:title > <title>.
+
+@functools.cache
+def _text_cleaner():
+    """Cleaner that strips non-prose markup before measuring text length.
+
+    Only scripts, styles, comments and form controls are removed; links,
+    structure and attributes are left alone.
     """
-    title_m = re.search(r"(?is)<title[^>]*>(.*?)</title>", raw_html)
-    title = unescape(title_m.group(1).strip()) if title_m else ""
-    og_m = re.search(
-        r'(?i)<meta[^>]+property=["\']og:title["\'][^>]+content=["\']([^"\']+)["\']',
-        raw_html,
-    ) or re.search(
-        r'(?i)<meta[^>]+content=["\']([^"\']+)["\'][^>]+property=["\']og:title["\']',
-        raw_html,
+    from lxml.html.clean import Cleaner
+
+    return Cleaner(
+        scripts=True, javascript=True, comments=True, style=True, forms=True,
+        links=False, meta=False, page_structure=False, embedded=False,
+        frames=False, annoying_tags=False, remove_unknown_tags=False,
+        safe_attrs_only=False,
     )
-    if og_m:
-        og_title = unescape(og_m.group(1).strip())
-        if og_title:
-            title = og_title
+
+
+def visible_text_len(el):
+    """Return the length of *el*'s whitespace-collapsed prose text.
+
+    Scripts, styles, comments and form controls are stripped from *el*
+    in place first.
+    """
+    _text_cleaner()(el)
+    return len(" ".join(el.text_content().split()))
+
+
+def readability_summary(tree):
+    """Run readability on a parsed tree.
+
+    Returns ``(doc, summary_html, summary_tree)``.  *summary_tree* is the
+    sanitized element readability serialized into *summary_html* (it
+    leaves it on ``Document.html``), so callers can inspect the summary
+    without parsing the string back.
+    """
+    from readability import Document
+
+    doc = Document(tree)
+    summary_html = doc.summary()
+    return doc, summary_html, doc.html
+
+
+def extract_metadata(raw_html, tree=None):
+    """Extract title and author from HTML meta tags and headings.
+
+    Title priority: <h1> > og:title > <title>.  Pass *tree* to reuse an
+    already-parsed tree.
+    """
+    if tree is None:
+        tree = parse_html(raw_html)
+
+    title = og_title = author = ""
+    seen_title = False
+    for el in tree.iter("title", "meta"):
+        if el.tag == "title":
+            # Only the first <title> is the page's; later ones are usually
+            # inline SVG labels, even when the page's own title is empty.
+            if not seen_title:
+                title = (el.text or "").strip()
+                seen_title = True
+            continue
+        content = (el.get("content") or "").strip()
+        if not content:
+            continue
+        if not og_title and (el.get("property") or "").lower() == "og:title":
+            og_title = content
+        elif not author and (el.get("name") or "").lower() == "author":
+            author = content
+        else:
+            continue
+        # These live in <head>; once all are found, skip walking the body.
+        if seen_title and og_title and author:
+            break
+    if og_title:
+        title = og_title
     # Find the first h1 whose content isn't entirely a link (nav/masthead
     # h1 tags are typically <h1><a href="/">Site Name</a></h1>).
-    for h1_m in re.finditer(r"(?is)<h1[^>]*>(.*?)</h1>", raw_html):
-        inner = h1_m.group(1).strip()
-        if re.match(r"(?is)^\s*<a\s[^>]*>.*?</a>\s*$", inner):
+    for h1 in tree.iter("h1"):
+        if (len(h1) and h1[0].tag == "a" and h1[-1].tag == "a"
+                and not (h1.text or "").strip()
+                and not (h1[-1].tail or "").strip()):
             continue
-        h1_text = unescape(re.sub(r"<[^>]+>", "", inner).strip())
+        h1_text = h1.text_content().strip()
         if h1_text:
             title = h1_text
             break
     # Discard garbage titles from SPA shells / error pages.
-    _garbage_titles = {"javascript is not available", "just a moment", "attention required"}
-    if title.lower().rstrip(".") in _garbage_titles:
+    if title.lower().rstrip(".") in _GARBAGE_TITLES:
         title = ""
-
-    author_m = re.search(
-        r'(?i)<meta[^>]+name=["\']author["\'][^>]+content=["\']([^"\']+)["\']',
-        raw_html,
-    )
-    author = unescape(author_m.group(1).strip()) if author_m else ""
     return title, author
 
 
@@ -159,13 +446,22 @@ def _mask_links(text):
     ``](url)`` strings in left-to-right order.  After ``textwrap``
     wraps the masked text, call `_restore_links` to put the URLs back.
     """
+    if "](" not in text:
+        return text, []
+    # Slice around each match rather than re.sub with a Python callback:
+    # everything up to the end of the link text is kept, ](url) is cut out.
+    parts = []
     urls = []
-
-    def _sub(m, _urls=urls):
-        _urls.append(m.group(0)[1 + len(m.group(1)):])   # ](url)
-        return "[" + m.group(1) + "\x01"
-
-    return _LINK_RE.sub(_sub, text), urls
+    prev = 0
+    for m in _LINK_RE.finditer(text):
+        text_end = m.end(1)
+        parts.append(text[prev:text_end])
+        urls.append(text[text_end:m.end()])   # ](url)
+        prev = m.end()
+    if not urls:
+        return text, urls
+    parts.append(text[prev:])
+    return "\x01".join(parts), urls
 
 
 def _restore_links(lines, urls):
@@ -173,62 +469,141 @@ def _restore_links(lines, urls):
 
     Sentinels are consumed left-to-right across all *lines*.
     """
+    if not urls:
+        return lines
     url_iter = iter(urls)
     out = []
     for line in lines:
-        parts = []
-        for ch in line:
-            if ch == "\x01":
-                parts.append(next(url_iter))
-            else:
-                parts.append(ch)
-        out.append("".join(parts))
+        if "\x01" in line:
+            parts = line.split("\x01")
+            line = "".join(
+                part + next(url_iter) for part in parts[:-1]
+            ) + parts[-1]
+        out.append(line)
     return out
 
 
+# Leading ```markdown fence, trailing ``` fence, and runs of 3+ newlines
+# (collapsed to a single blank line), handled in one pass.
+_FIXUP_RE = re.compile(
+    r"(?P<open>\A```\s*(?:markdown)?\s*\n?)"
+    r"|(?P<close>\n?```\s*$)"
+    r"|(?P<blank>\n{3,})"
+)
+
+
+def _fixup(m):
+    return "\n\n" if m.lastgroup == "blank" else ""
+
+
+# Lines that start a markdown block and so must not be joined into the
+# preceding paragraph.  Also applied to blockquote contents (after the
+# ">" marker), where a further ">" means a nested blockquote.
+_STRUCTURAL_RE = re.compile(
+    r'^(?:'
+    r'#{1,6}\s'        # heading
+    r'|---+\s*$'       # horizontal rule
+    r'|>'              # blockquote
+    r'|\|'             # table
+    r'|!\['            # image
+    r'|```'            # code fence
+    r'|\s*[-*+]\s+'   # unordered list
+    r'|\s*\d+[.)]\s+' # ordered list
+    r')'
+)
+# First characters a structural line can start with; anything else (the
+# common case: prose) is settled without running the regex.  Lines
+# starting with other whitespace may still be indented list items, and
+# ``\d`` also matches non-ASCII digits, which str.isdigit() lets through.
+_STRUCTURAL_FIRST = frozenset("#->|!`*+0123456789")
+
+
+def _is_structural(line):
+    first = line[:1]
+    if first not in _STRUCTURAL_FIRST and not (first.isspace() or first.isdigit()):
+        return False
+    return _STRUCTURAL_RE.match(line) is not None
+
+
+_LIST_ITEM_RE = re.compile(r"\s*[\-\*\+]\s+|\s*\d+[.)]\s+")
+
+
+def _match_list_item(line):
+    """Match a list marker (with its indent) at the start of *line*."""
+    first = line[:1]
+    if first not in _STRUCTURAL_FIRST and not (first.isspace() or first.isdigit()):
+        return None
+    return _LIST_ITEM_RE.match(line)
+
+
+# Long lines that are still left unwrapped: headings, HRs, tables, images.
+# Each alternative starts with one of "#-|!", which is checked first.
+_NO_WRAP_RE = re.compile(r"#{1,6}\s|---+\s*$|\||!\[")
+
+
+@functools.lru_cache(maxsize=32)
+def _wrapper(width, subsequent_indent):
+    """Shared TextWrapper for one width/indent; wrap() leaves it unchanged."""
+    return textwrap.TextWrapper(
+        width=width,
+        break_long_words=False,
+        break_on_hyphens=False,
+        subsequent_indent=subsequent_indent,
+    )
+
+
+# Whitespace that textwrap treats specially: tabs and other ASCII
+# spaces, runs of spaces, and "words" made only of Unicode whitespace
+# (e.g. a lone nbsp), which it drops at line edges.  Lines containing
+# any go through TextWrapper.
+_WRAP_SLOW_RE = re.compile(r"[\t\n\x0b\x0c\r]|  |(?:^| )[^\S ]+(?: |$)")
+
+
+def _wrap(text, width, subsequent_indent=""):
+    """Greedy-wrap *text* the way `_wrapper` would, but faster.
+
+    Covers the common case of words separated by single spaces, where
+    TextWrapper's chunking reduces to packing words into lines; anything
+    else is handed to TextWrapper itself.
+    """
+    if text[:1] == " " or text[-1:] == " " or _WRAP_SLOW_RE.search(text):
+        return _wrapper(width, subsequent_indent).wrap(text)
+    lines = []
+    indent = ""
+    room = width
+    words = []
+    used = 0
+    for word in text.split(" "):
+        if words and used + 1 + len(word) > room:
+            lines.append(indent + " ".join(words))
+            indent = subsequent_indent
+            room = width - len(indent)
+            words = [word]
+            used = len(word)
+        else:
+            if words:
+                used += 1
+            used += len(word)
+            words.append(word)
+    lines.append(indent + " ".join(words))
+    return lines
+
+
 def postprocess(markdown: str) -> str:
     """Normalize quotes, strip code fences, and wrap lines at 100 chars."""
 
     # Normalize curly quotes/apostrophes to straight ones.
     markdown = _normalize_quotes(markdown)
 
-    # Strip ```markdown / ``` fences.
-    markdown = re.sub(r"^```\s*(?:markdown)?\s*\n?", "", markdown)
-    markdown = re.sub(r"\n?```\s*$", "", markdown)
-
-    # Collapse runs of 3+ newlines into 2 (single blank line).
-    markdown = re.sub(r"\n{3,}", "\n\n", markdown)
+    # Strip ```markdown / ``` fences and collapse runs of 3+ newlines into
+    # 2 (single blank line).
+    markdown = _FIXUP_RE.sub(_fixup, markdown)
 
     # Re-join soft-wrapped paragraph lines before re-wrapping.
     # Conversion tools (or HTML source whitespace) may break paragraphs into
     # short lines; joining them lets the wrapping below target the correct
     # display width.  Only consecutive non-indented, non-structural lines are
     # joined — headings, lists, blockquotes, code fences, etc. are preserved.
-    _structural_re = re.compile(
-        r'^(?:'
-        r'#{1,6}\s'        # heading
-        r'|---+\s*$'       # horizontal rule
-        r'|>'              # blockquote
-        r'|\|'             # table
-        r'|!\['            # image
-        r'|```'            # code fence
-        r'|\s*[-*+]\s+'   # unordered list
-        r'|\s*\d+[.)]\s+' # ordered list
-        r')'
-    )
-    # Structural patterns for content inside blockquotes (no blockquote marker).
-    _bq_inner_structural_re = re.compile(
-        r'^(?:'
-        r'#{1,6}\s'        # heading
-        r'|---+\s*$'       # horizontal rule
-        r'|>'              # nested blockquote
-        r'|\|'             # table
-        r'|!\['            # image
-        r'|```'            # code fence
-        r'|\s*[-*+]\s+'   # unordered list
-        r'|\s*\d+[.)]\s+' # ordered list
-        r')'
-    )
     rejoined = []
     para_buf = []
     bq_buf = []
@@ -257,14 +632,14 @@ def postprocess(markdown: str) -> str:
             in_code_fence = not in_code_fence
         elif in_code_fence:
             rejoined.append(line)
-        elif re.match(r'^> ?', line):
+        elif line.startswith(">"):
             # Blockquote line — join consecutive paragraph lines within.
             if para_buf:
                 rejoined.append(" ".join(para_buf))
                 para_buf = []
             _flush_list()
-            inner = re.match(r'^> ?(.*)', line).group(1)
-            if inner.strip() and not _bq_inner_structural_re.match(inner):
+            inner = line[2:] if line.startswith("> ") else line[1:]
+            if inner.strip() and not _is_structural(inner):
                 bq_buf.append(inner)
             else:
                 if bq_buf:
@@ -272,7 +647,7 @@ def postprocess(markdown: str) -> str:
                     bq_buf = []
                 rejoined.append(line)
         else:
-            list_m = re.match(r'^(\s*[\-\*\+]\s+|\s*\d+[.)]\s+)', line)
+            list_m = _match_list_item(line)
             if list_m:
                 # New list item — flush previous buffers, start list accumulation.
                 if bq_buf:
@@ -286,10 +661,10 @@ def postprocess(markdown: str) -> str:
                 list_cont_indent = " " * len(list_m.group(0))
             elif (list_buf and stripped
                   and line.startswith(list_cont_indent)
-                  and not _structural_re.match(stripped)):
+                  and not _is_structural(stripped)):
                 # Continuation of current list item (indented plain text).
                 list_buf.append(stripped)
-            elif stripped and not line[0].isspace() and not _structural_re.match(line):
+            elif stripped and not line[0].isspace() and not _is_structural(line):
                 if bq_buf:
                     rejoined.append("> " + " ".join(bq_buf))
                     bq_buf = []
@@ -309,7 +684,6 @@ def postprocess(markdown: str) -> str:
     if para_buf:
         rejoined.append(" ".join(para_buf))
     _flush_list()
-    markdown = "\n".join(rejoined)
 
     # Wrap text body at 100 raw chars.
     #
@@ -317,46 +691,35 @@ def postprocess(markdown: str) -> str:
     # link text words in place so textwrap can break between words inside
     # link text (valid CommonMark).  After wrapping we restore each \x01
     # to its ](url) in left-to-right order.
+    #
+    # Rejoined lines never contain a newline, so they're wrapped as-is
+    # rather than joined into one string and split again.
     wrapped_lines = []
-    for line in markdown.split("\n"):
-        # Don't wrap headings, HRs, blank lines, tables, or images.
+    for line in rejoined:
+        # Don't wrap short lines, blank lines, headings, HRs, tables, or
+        # images.  Most lines are short, so length is checked first.
         if (
-            not line.strip()
-            or re.match(r"^#{1,6}\s+", line)
-            or re.match(r"^---+\s*$", line)
-            or re.match(r"^\|", line)
-            or re.match(r"^!\[", line)
-            or len(line) <= 100
+            len(line) <= 100
+            or not line.strip()
+            or (line[0] in "#-|!" and _NO_WRAP_RE.match(line))
         ):
             wrapped_lines.append(line)
-        elif re.match(r"^> ?", line):
+        elif line.startswith(">"):
             # Wrap blockquote content, preserving the > prefix on each line.
-            bq_m = re.match(r"^(> ?)", line)
             prefix = "> "
-            inner = line[len(bq_m.group(1)):]
+            inner = line[2:] if line.startswith("> ") else line[1:]
 
             masked, urls = _mask_links(inner)
-            wrapped = textwrap.wrap(
-                masked,
-                width=100 - len(prefix),
-                break_long_words=False,
-                break_on_hyphens=False,
-            )
+            wrapped = _wrap(masked, 100 - len(prefix))
             wrapped = _restore_links(wrapped, urls)
             wrapped_lines.extend(prefix + wl for wl in wrapped)
         else:
             # Detect list items to compute continuation indent.
-            list_m = re.match(r"^(\s*[\-\*\+]\s+|\s*\d+[.)]\s+)", line)
+            list_m = _match_list_item(line)
             cont_indent = " " * len(list_m.group(0)) if list_m else ""
 
             masked, urls = _mask_links(line)
-            wrapped = textwrap.wrap(
-                masked,
-                width=100,
-                break_long_words=False,
-                break_on_hyphens=False,
-                subsequent_indent=cont_indent,
-            )
+            wrapped = _wrap(masked, 100, cont_indent)
             wrapped = _restore_links(wrapped, urls)
             wrapped_lines.extend(wrapped)
 
@@ -367,14 +730,21 @@ def postprocess(markdown: str) -> str:
     return markdown
 
 
+# Images fetched at once per article, over one AsyncSession so requests
+# to the same host share connections.
+IMAGE_WORKERS = 8
+
 _MARKDOWN_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)]+)\)")
+_UNSAFE_FILENAME_RE = re.compile(r"[^a-zA-Z0-9._-]")
 
 
 
-def _local_filename(raw_url, used_names):
+def _local_filename(raw_url, used_names, next_suffix=None):
     """Generate a sanitized, deduplicated local filename from a URL.
 
-    Port of Go's images.go:localFilename().
+    Port of Go's images.go:localFilename().  Pass the same *next_suffix*
+    dict across calls so repeated names resume numbering where the last
+    one left off instead of probing from -2 each time.
     """
     try:
         parsed = urlparse(raw_url)
@@ -386,7 +756,7 @@ def _local_filename(raw_url, used_names):
         base = "image.png"
 
     # Sanitize: keep only alphanumeric, hyphens, underscores, dots.
-    name = re.sub(r"[^a-zA-Z0-9._-]", "", base)
+    name = _UNSAFE_FILENAME_RE.sub("", base)
     if not name:
         name = "image.png"
 
@@ -398,10 +768,12 @@ def _local_filename(raw_url, used_names):
     if name not in used_names:
         return name
     stem, ext = os.path.splitext(name)
-    i = 2
+    i = next_suffix.get(name, 2) if next_suffix is not None else 2
     while True:
         candidate = f"{stem}-{i}{ext}"
         if candidate not in used_names:
+            if next_suffix is not None:
+                next_suffix[name] = i + 1
             return candidate
         i += 1
 
@@ -412,24 +784,21 @@ def download_images(markdown):
     Returns (rewritten_markdown, [{"path": "images/filename", "data": base64_str}]).
     Failed downloads keep the original remote URL.
     """
-    from curl_cffi import requests as curl_requests
-
-    matches = list(_MARKDOWN_IMAGE_RE.finditer(markdown))
-    if not matches:
-        return markdown, []
+    from curl_cffi.requests import AsyncSession
 
     # Collect unique remote URLs.
     used_names = set()
+    next_suffix = {}  # name -> next -N to try
     seen = {}  # url -> local filename
     remote_urls = []
 
-    for m in matches:
+    for m in _MARKDOWN_IMAGE_RE.finditer(markdown):
         url = m.group(2)
         if not (url.startswith("http://") or url.startswith("https://")):
             continue
         if url in seen:
             continue
-        filename = _local_filename(url, used_names)
+        filename = _local_filename(url, used_names, next_suffix)
         used_names.add(filename)
         seen[url] = filename
         remote_urls.append(url)
@@ -437,19 +806,34 @@ def download_images(markdown):
     if not remote_urls:
         return markdown, []
 
-    # Download each image.
-    downloaded = {}  # url -> base64 data
-    for url in remote_urls:
+    async def _fetch(session, url):
+        """Return ``(base64_str, size, error)`` for one image.
+
+        Encoding here lets the raw bytes be freed as soon as each download
+        finishes instead of waiting for the rest of the batch.
+        """
         try:
-            resp = curl_requests.get(url, impersonate="chrome", timeout=30)
-            data = resp.content
-            if data:
-                downloaded[url] = base64.b64encode(data).decode("ascii")
-                print(f"[images] downloaded {seen[url]} ({len(data)} bytes)")
-            else:
-                print(f"[images] failed {url}: empty response")
+            resp = await session.get(url, timeout=30)
         except Exception as e:
-            print(f"[images] failed {url}: {e}")
+            return None, 0, e
+        data = resp.content
+        return base64.b64encode(data).decode("ascii"), len(data), None
+
+    async def _fetch_all():
+        async with AsyncSession(impersonate="chrome", max_clients=IMAGE_WORKERS) as session:
+            return await asyncio.gather(*(_fetch(session, url) for url in remote_urls))
+
+    # Download images concurrently; results come back in order.  Callers
+    # run this off the event loop (it's blocking), so it gets its own.
+    downloaded = {}  # url -> base64 data
+    for url, (b64, size, err) in zip(remote_urls, asyncio.run(_fetch_all())):
+        if err is not None:
+            print(f"[images] failed {url}: {err}")
+        elif size:
+            downloaded[url] = b64
+            print(f"[images] downloaded {seen[url]} ({size} bytes)")
+        else:
+            print(f"[images] failed {url}: empty response")
 
     if not downloaded:
         return markdown, []
@@ -463,20 +847,18 @@ def download_images(markdown):
             image_list.append({"path": path, "data": b64})
             seen_paths.add(path)
 
-    # Rewrite markdown references (process in reverse to preserve indices).
-    result = markdown
-    for m in reversed(matches):
+    # Rewrite markdown references to the downloaded copies.
+    def _rewrite(m):
         url = m.group(2)
         if url not in downloaded:
-            continue
+            return m.group(0)
         alt = m.group(1)
         filename = seen[url]
         if not alt:
             alt = os.path.splitext(filename)[0]
-        replacement = f"![{alt}](images/{filename})"
-        result = result[:m.start()] + replacement + result[m.end():]
+        return f"![{alt}](images/{filename})"
 
-    return result, image_list
+    return _MARKDOWN_IMAGE_RE.sub(_rewrite, markdown), image_list
 
 
 _YAML_SPECIAL_RE = re.compile(r"[:#{}[\]&*!|>'\"%@`]")
@@ -513,8 +895,22 @@ def format_article(title, author, source, markdown):
     return "\n".join(lines)
 
 
+def localize_images(result):
+    """Download a conversion result's images and point its markdown at them.
+
+    Returns a copy of *result* with rewritten ``markdown`` and an
+    ``images`` list, ready for `format_result`.
+    """
+    markdown, images = download_images(result["markdown"])
+    return {**result, "markdown": markdown, "images": images}
+
+
+def format_result(result, url):
+    """Format a localized conversion result as the endpoint response."""
+    content = format_article(result["title"], result["author"], url, result["markdown"])
+    return {"title": result["title"], "content": content, "images": result["images"]}
+
+
 def build_result(result, url):
     """Download images and format article from a conversion result dict."""
-    markdown, images = download_images(result["markdown"])
-    content = format_article(result["title"], result["author"], url, markdown)
-    return {"title": result["title"], "content": content, "images": images}
+    return format_result(localize_images(result), url)